@@ -1,8 +1,17 @@
-import json
+from collections import defaultdict
 from pathlib import Path
 from typing import Dict
-from threading import Lock
-from cache import CacheManager
+from threading import Event, Lock, Thread, get_ident
+from cache import CacheManager, read_json, write_json
+
+
+BUCKET_NAMES = ("old", "medium", "new", "all")
+FLUSH_DELAY_SECONDS = 0.5
+
+
+def _new_cell() -> Dict:
+    """Create an empty per-thread counter cell"""
+    return {"total": 0, "buckets": defaultdict(int), "albums": defaultdict(int)}
 
 
 class AnalyticsTracker:
@@ -15,86 +24,124 @@ class AnalyticsTracker:
         self.analytics_file = Path(analytics_file)
         self.analytics_file.parent.mkdir(exist_ok=True)
 
-        # Initialize counters
-        self.total_rerolls = 0
-        self.rerolls_per_bucket: Dict[str, int] = {
-            "old": 0,
-            "medium": 0,
-            "new": 0,
-            "all": 0,
-        }
-        self.times_shown_per_album: Dict[int, int] = {}
-
-        # Lock for thread safety
-        self._lock = Lock()
+        # Per-thread counter cells, summed on read (LongAdder-style). Each
+        # thread only ever writes its own cell, so increments need no lock;
+        # the lock only guards creating cells and summing them.
+        self._cells: Dict[int, Dict] = {}
+        self._cells_lock = Lock()
 
         # Load existing analytics if available
         self.load_analytics()
 
+        # Increments only flag the counters as dirty; a daemon thread batches
+        # the disk writes so the request path never waits on the file system
+        self._dirty = Event()
+        self._stop = Event()
+        self._flusher_thread = Thread(
+            target=self._flusher, name="analytics-flusher", daemon=True
+        )
+        self._flusher_thread.start()
+
+    def _cell(self) -> Dict:
+        """Get the calling thread's counter cell, creating it on first use"""
+        ident = get_ident()
+        cell = self._cells.get(ident)
+        if cell is None:
+            with self._cells_lock:
+                cell = self._cells.setdefault(ident, _new_cell())
+        return cell
+
     def load_analytics(self):
         """Load analytics from disk"""
+        cell = _new_cell()
         if self.analytics_file.exists():
             try:
-                with open(self.analytics_file, "r") as f:
-                    data = json.load(f)
-                    self.total_rerolls = data.get("total_rerolls", 0)
-                    self.rerolls_per_bucket = data.get(
-                        "rerolls_per_bucket",
-                        {"old": 0, "medium": 0, "new": 0, "all": 0},
-                    )
-                    self.times_shown_per_album = {
+                data = read_json(self.analytics_file)
+                cell["total"] = data.get("total_rerolls", 0)
+                cell["buckets"].update(data.get("rerolls_per_bucket", {}))
+                cell["albums"].update(
+                    {
                         int(k): v
                         for k, v in data.get("times_shown_per_album", {}).items()
                     }
+                )
             except Exception:
                 # If loading fails, start with fresh counters
-                pass
+                cell = _new_cell()
+
+        with self._cells_lock:
+            self._cells = {get_ident(): cell}
+
+    def _mark_dirty(self):
+        """Wake the flusher; Event.set() takes a lock, so skip it while already set"""
+        if not self._dirty.is_set():
+            self._dirty.set()
+
+    def _flusher(self):
+        """Write analytics to disk whenever counters changed, at most every FLUSH_DELAY_SECONDS"""
+        while not self._stop.is_set():
+            self._dirty.wait()
+            # Let a burst of increments settle into a single write
+            self._stop.wait(FLUSH_DELAY_SECONDS)
+            self._dirty.clear()
+            self.save_analytics()
+
+    def close(self):
+        """Stop the flusher thread and write a final snapshot"""
+        self._stop.set()
+        self._dirty.set()
+        self._flusher_thread.join()
+        self.save_analytics()
 
     def save_analytics(self):
         """Save analytics to disk"""
         try:
-            data = {
-                "total_rerolls": self.total_rerolls,
-                "rerolls_per_bucket": self.rerolls_per_bucket,
-                "times_shown_per_album": self.times_shown_per_album,
-            }
-            with open(self.analytics_file, "w") as f:
-                json.dump(data, f)
+            write_json(self.analytics_file, self.get_analytics())
         except Exception:
             # If saving fails, just continue - don't break the app
             pass
 
     def increment_reroll(self, bucket: str = "all"):
         """Increment total rerolls and bucket-specific rerolls"""
-        with self._lock:
-            self.total_rerolls += 1
-            self.rerolls_per_bucket[bucket] = self.rerolls_per_bucket.get(bucket, 0) + 1
+        cell = self._cell()
+        cell["total"] += 1
+        cell["buckets"][bucket] += 1
+        self._mark_dirty()
 
     def increment_album_shown(self, collection_id: int):
         """Increment times shown for a specific album"""
-        with self._lock:
-            self.times_shown_per_album[collection_id] = (
-                self.times_shown_per_album.get(collection_id, 0) + 1
-            )
+        self._cell()["albums"][collection_id] += 1
+        self._mark_dirty()
 
     def get_analytics(self) -> Dict:
-        """Get all analytics data"""
+        """Get all analytics data, summed across all thread cells"""
+        total_rerolls = 0
+        rerolls_per_bucket: Dict[str, int] = dict.fromkeys(BUCKET_NAMES, 0)
+        times_shown_per_album: Dict[int, int] = {}
+
+        with self._cells_lock:
+            cells = list(self._cells.values())
+
+        for cell in cells:
+            total_rerolls += cell["total"]
+            # dict.copy() is atomic, so owners may keep inserting while we sum
+            for bucket, count in cell["buckets"].copy().items():
+                rerolls_per_bucket[bucket] = rerolls_per_bucket.get(bucket, 0) + count
+            for collection_id, count in cell["albums"].copy().items():
+                times_shown_per_album[collection_id] = (
+                    times_shown_per_album.get(collection_id, 0) + count
+                )
+
         return {
-            "total_rerolls": self.total_rerolls,
-            "rerolls_per_bucket": self.rerolls_per_bucket,
-            "times_shown_per_album": self.times_shown_per_album,
+            "total_rerolls": total_rerolls,
+            "rerolls_per_bucket": rerolls_per_bucket,
+            "times_shown_per_album": times_shown_per_album,
         }
 
-    def increment_and_save_sometimes(
-        self, bucket: str, collection_id: int, save_every: int = 50
-    ):
-        """Increment counters and save to disk periodically"""
-        with self._lock:
-            self.total_rerolls += 1
-            self.rerolls_per_bucket[bucket] = self.rerolls_per_bucket.get(bucket, 0) + 1
-            self.times_shown_per_album[collection_id] = (
-                self.times_shown_per_album.get(collection_id, 0) + 1
-            )
-
-            if self.total_rerolls % save_every == 0:
-                self.save_analytics()
+    def increment_and_save_sometimes(self, bucket: str, collection_id: int):
+        """Increment counters and let the flusher thread save them to disk"""
+        cell = self._cell()
+        cell["total"] += 1
+        cell["buckets"][bucket] += 1
+        cell["albums"][collection_id] += 1
+        self._mark_dirty()
@@ -1,9 +1,41 @@
-import json
+import os
+import sqlite3
+from contextlib import contextmanager
 from pathlib import Path
+from threading import RLock
 from typing import Optional, Dict, Any
+
+import orjson
+
 from models import CacheData, Album
 
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS albums (
+    collection_id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    json BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, ids BLOB NOT NULL);
+CREATE TABLE IF NOT EXISTS lengths (id INTEGER PRIMARY KEY, millis INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, val BLOB NOT NULL);
+"""
+
+
+def write_json(path: Path, data: Any):
+    """Encode data in one go and atomically replace the file with a single write"""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp_path, path)
+
+
+def read_json(path: Path) -> Any:
+    """Read and decode a JSON file"""
+    with open(path, "rb") as f:
+        return orjson.loads(f.read())
+
+
 class CacheManager:
     """Manages disk and in-memory caching for albums, buckets, and track lengths"""
 
@@ -13,37 +45,54 @@ class CacheManager:
 
         # In-memory cache
         self._cache_data: Optional[CacheData] = None
+        self._albums_by_id: Dict[int, Album] = {}
 
         # File paths
-        self.albums_file = self.cache_dir / "albums.json"
-        self.buckets_file = self.cache_dir / "buckets.json"
-        self.lengths_file = self.cache_dir / "lengths.json"
-        self.catalog_meta_file = self.cache_dir / "catalog_meta.json"
+        self.db_file = self.cache_dir / "cache.db"
         self.analytics_file = self.cache_dir / "analytics.json"
 
+        # One connection shared by the event loop and worker threads; the lock
+        # serializes access and keeps buffered() transactions from interleaving.
+        # Each setter updates only the rows it changed.
+        self._lock = RLock()
+        self._conn = sqlite3.connect(
+            self.db_file, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        # Load eagerly so getters can read _cache_data without going through load_cache()
+        self.load_cache()
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
     def load_cache(self) -> CacheData:
-        """Load cache data from disk, with fallback to empty cache if files don't exist"""
+        """Load cache data from disk, with fallback to empty cache if the database is empty"""
         if self._cache_data is not None:
             return self._cache_data
 
         # Create empty cache data
         self._cache_data = CacheData()
 
-        # Load albums
-        if self.albums_file.exists():
-            with open(self.albums_file, "r") as f:
-                albums_data = json.load(f)
-                self._cache_data.albums = [Album(**album) for album in albums_data]
+        with self._lock:
+            # Load albums
+            rows = self._conn.execute("SELECT json FROM albums ORDER BY position")
+            self._cache_data.albums = [
+                Album.model_validate_json(blob) for (blob,) in rows
+            ]
+            self._index_albums()
 
-        # Load buckets
-        if self.buckets_file.exists():
-            with open(self.buckets_file, "r") as f:
-                self._cache_data.buckets = json.load(f)
+            # Load buckets
+            rows = self._conn.execute("SELECT name, ids FROM buckets")
+            self._cache_data.buckets = {name: orjson.loads(ids) for name, ids in rows}
 
-        # Load lengths
-        if self.lengths_file.exists():
-            with open(self.lengths_file, "r") as f:
-                self._cache_data.lengths = json.load(f)
+            # Load lengths
+            rows = self._conn.execute("SELECT id, millis FROM lengths")
+            self._cache_data.lengths = dict(rows)
 
         return self._cache_data
 
@@ -52,69 +101,123 @@ class CacheManager:
         if self._cache_data is None:
             return
 
-        # Save albums
-        albums_data = [album.model_dump() for album in self._cache_data.albums]
-        with open(self.albums_file, "w") as f:
-            json.dump(albums_data, f)
+        with self.buffered():
+            self._save_albums()
+            self._save_buckets()
+            self._conn.execute("DELETE FROM lengths")
+            self._conn.executemany(
+                "INSERT INTO lengths VALUES (?, ?)", self._cache_data.lengths.items()
+            )
 
-        # Save buckets
-        with open(self.buckets_file, "w") as f:
-            json.dump(self._cache_data.buckets, f)
+    @contextmanager
+    def buffered(self):
+        """Group cache writes into one transaction that commits when the block exits"""
+        with self._lock:
+            if self._conn.in_transaction:
+                # Nested inside another buffered() block, which owns the commit
+                yield self
+                return
+
+            # Setters update memory before writing, so a rollback must also put
+            # the in-memory state back to what the database still holds
+            data = self._cache_data
+            snapshot = (
+                data.albums,
+                data.buckets,
+                dict(data.lengths),
+                self._albums_by_id,
+            )
+            self._conn.execute("BEGIN")
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                data.albums, data.buckets, data.lengths, self._albums_by_id = snapshot
+                raise
+            self._conn.execute("COMMIT")
+
+    def _save_albums(self):
+        """Replace the stored album rows, keeping the list order"""
+        with self.buffered():
+            self._conn.execute("DELETE FROM albums")
+            self._conn.executemany(
+                "INSERT INTO albums VALUES (?, ?, ?)",
+                (
+                    (album.collection_id, position, album.model_dump_json())
+                    for position, album in enumerate(self._cache_data.albums)
+                ),
+            )
 
-        # Save lengths
-        with open(self.lengths_file, "w") as f:
-            json.dump(self._cache_data.lengths, f)
+    def _save_buckets(self):
+        """Replace the stored bucket rows"""
+        with self.buffered():
+            self._conn.execute("DELETE FROM buckets")
+            self._conn.executemany(
+                "INSERT INTO buckets VALUES (?, ?)",
+                (
+                    (name, orjson.dumps(ids))
+                    for name, ids in self._cache_data.buckets.items()
+                ),
+            )
 
     def get_albums(self) -> list[Album]:
         """Get all albums from cache"""
-        return self.load_cache().albums
+        return self._cache_data.albums
+
+    def _index_albums(self):
+        """Rebuild the collection_id -> Album lookup table"""
+        self._albums_by_id = {
+            album.collection_id: album for album in self._cache_data.albums
+        }
 
     def get_album_by_id(self, collection_id: int) -> Optional[Album]:
         """Get a specific album by collection_id"""
-        for album in self.get_albums():
-            if album.collection_id == collection_id:
-                return album
-        return None
+        return self._albums_by_id.get(collection_id)
 
     def set_albums(self, albums: list[Album]):
         """Set albums in cache"""
-        cache = self.load_cache()
-        cache.albums = albums
-        self.save_cache()
+        self._cache_data.albums = albums
+        self._index_albums()
+        self._save_albums()
 
     def get_buckets(self) -> dict:
         """Get precomputed buckets"""
-        return self.load_cache().buckets
+        return self._cache_data.buckets
 
     def set_buckets(self, buckets: dict):
         """Set buckets in cache"""
-        cache = self.load_cache()
-        cache.buckets = buckets
-        self.save_cache()
+        self._cache_data.buckets = buckets
+        self._save_buckets()
 
     def get_runtime(self, collection_id: int) -> Optional[int]:
         """Get runtime for an album from cache"""
-        cache = self.load_cache()
-        return cache.lengths.get(str(collection_id))
+        return self._cache_data.lengths.get(collection_id)
 
     def set_runtime(self, collection_id: int, runtime_millis: int):
         """Set runtime for an album in cache"""
-        cache = self.load_cache()
-        cache.lengths[str(collection_id)] = runtime_millis
-        self.save_cache()
+        self._cache_data.lengths[collection_id] = runtime_millis
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO lengths VALUES (?, ?)",
+                (collection_id, runtime_millis),
+            )
 
     def get_catalog_meta(self) -> Optional[Dict[str, Any]]:
         """Get the cached catalog meta"""
-        if not self.catalog_meta_file.exists():
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT val FROM kv WHERE key = 'catalog_meta'"
+            ).fetchone()
+        if row is None:
             return None
 
-        with open(self.catalog_meta_file, "r") as f:
-            return json.load(f)
+        return orjson.loads(row[0])
 
     def set_catalog_meta(self, date_str: str, max_episode: int, version: int):
         """Set the cached catalog meta"""
-        with open(self.catalog_meta_file, "w") as f:
-            json.dump(
-                {"date": date_str, "max_episode": max_episode, "version": version},
-                f,
+        meta = {"date": date_str, "max_episode": max_episode, "version": version}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv VALUES ('catalog_meta', ?)",
+                (orjson.dumps(meta),),
             )
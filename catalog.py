@@ -1,10 +1,11 @@
 from datetime import date
-from typing import List, Dict
+from typing import List, Dict, Optional
+from operator import attrgetter
 import asyncio
 import re
 
 from models import Album
-from itunes_client import iTunesClient
+from itunes_client import RateLimiter, iTunesClient
 from cache import CacheManager
 
 
@@ -13,8 +14,8 @@ DEFAULT_MAX_EPISODE = 240
 MAX_EPISODE_SCAN_STEP = 10
 MAX_EMPTY_EPISODE_RANGES = 3
 MAX_EPISODE_SCAN_EXTENSION = 60
-SEARCH_CONCURRENCY = 1
-SEARCH_PAUSE_SECONDS = 0.25
+SEARCH_CONCURRENCY = 8
+SEARCH_RATE_PER_SECOND = 4
 
 
 class CatalogBuilder:
@@ -28,8 +29,39 @@ class CatalogBuilder:
         self._refresh_target = 0
         self._last_album_count = len(self.cache_manager.get_albums())
         self._refresh_reason = None
+        self._search_limiter = RateLimiter(SEARCH_RATE_PER_SECOND)
+        self._version = 0
+        self._build_task: Optional[asyncio.Task] = None
+        self._build_forced = False
+        self._bucket_albums: Dict[str, List[Album]] = {}
+        self._bucket_albums_version = -1
 
     async def build_catalog(self, force_refresh: bool = False) -> List[Album]:
+        """Build the complete album catalog, joining a build that is already running"""
+        running = self._build_task
+        if running is None or running.done():
+            self._build_task = asyncio.create_task(self._build_catalog(force_refresh))
+            self._build_forced = force_refresh
+        elif force_refresh and not self._build_forced:
+            # The running build may be served from today's cache, so a forced
+            # refresh queues its own build to start once that one is done
+            self._build_task = asyncio.create_task(self._forced_build_after(running))
+            self._build_forced = True
+        # Shielded so one cancelled caller does not abort the shared build
+        return await asyncio.shield(self._build_task)
+
+    async def _forced_build_after(self, previous: asyncio.Task) -> List[Album]:
+        """Run a forced build once the given build has finished"""
+        await asyncio.gather(previous, return_exceptions=True)
+        return await self._build_catalog(force_refresh=True)
+
+    async def cancel_build(self) -> None:
+        """Cancel a running build and wait until it has stopped"""
+        if self._build_task is not None and not self._build_task.done():
+            self._build_task.cancel()
+            await asyncio.gather(self._build_task, return_exceptions=True)
+
+    async def _build_catalog(self, force_refresh: bool) -> List[Album]:
         """Build the complete album catalog, using cache if available"""
         self._refresh_state = "running"
         self._refresh_processed = 0
@@ -80,7 +112,12 @@ class CatalogBuilder:
 
         if not albums_by_number:
             if cached_albums:
-                self.cache_manager.set_catalog_meta(today, max_seed, CATALOG_VERSION)
+                await asyncio.to_thread(
+                    self.cache_manager.set_catalog_meta,
+                    today,
+                    max_seed,
+                    CATALOG_VERSION,
+                )
                 await self._precompute_buckets(cached_albums)
                 self._refresh_state = "idle"
                 self._last_album_count = len(cached_albums)
@@ -89,90 +126,109 @@ class CatalogBuilder:
             self._refresh_reason = "empty"
             return []
 
-        albums = [albums_by_number[number] for number in sorted(albums_by_number)]
+        # One collection can be the best match for several numbers (double
+        # episodes); keep it once, under its lowest episode number
+        albums = []
+        seen_ids = set()
+        for number in sorted(albums_by_number):
+            album = albums_by_number[number]
+            if album.collection_id not in seen_ids:
+                seen_ids.add(album.collection_id)
+                albums.append(album)
         sorted_albums = self._numeric_sort_albums(albums)
 
-        self.cache_manager.set_albums(sorted_albums)
-        self.cache_manager.set_catalog_meta(today, max_found, CATALOG_VERSION)
+        # Serializing and writing the cache happens on a worker thread so the
+        # event loop keeps serving requests meanwhile
+        await asyncio.to_thread(self._store_catalog, sorted_albums)
+        await asyncio.to_thread(
+            self.cache_manager.set_catalog_meta, today, max_found, CATALOG_VERSION
+        )
 
-        await self._precompute_buckets(sorted_albums)
         self._refresh_state = "idle"
         self._last_album_count = len(sorted_albums)
         return sorted_albums
 
     def _numeric_sort_albums(self, albums: List[Album]) -> List[Album]:
         """Sort albums by numeric-aware sorting on collectionName (e.g. 'Folge 2' before 'Folge 10')"""
-
-        def extract_number(text: str) -> tuple:
-            match = re.search(r"\d+", text)
-            if match:
-                number = int(match.group())
-                prefix = text[: match.start()]
-                suffix = text[match.end() :]
-                return (prefix, number, suffix)
-            return (text, 0, "")
-
-        return sorted(
-            albums, key=lambda album: extract_number(album.collection_name.lower())
-        )
+        return sorted(albums, key=attrgetter("sort_key"))
 
     async def _fetch_episode_range(self, start: int, end: int) -> Dict[int, Album]:
         if end < start:
             return {}
 
         albums_by_number: Dict[int, Album] = {}
-        semaphore = asyncio.Semaphore(SEARCH_CONCURRENCY)
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for number in range(start, end + 1):
+            queue.put_nowait(number)
+
+        async def worker():
+            while not queue.empty():
+                await fetch_episode(queue.get_nowait())
 
         async def fetch_episode(number: int):
             term = f"Folge {number} Die drei ???"
-            async with semaphore:
-                data = await self.itunes_client.search_albums(term)
-                await asyncio.sleep(SEARCH_PAUSE_SECONDS)
+            data = await self.itunes_client.search_albums(term, self._search_limiter)
 
             self._refresh_processed += 1
             if not data:
                 return
 
             pattern = re.compile(rf"Folge\s+{number}\b", re.IGNORECASE)
-            candidates = []
-            for result in data.get("results", []):
-                if result.get("wrapperType") != "collection":
-                    continue
-                if result.get("collectionType") != "Album":
-                    continue
-                if result.get("artistName") != "Die drei ???":
-                    continue
-                name = result.get("collectionName", "")
-                if not pattern.search(name):
-                    continue
-                candidates.append(result)
-
-            if not candidates:
-                return
-
-            candidates.sort(
+            # Filter and pick the best match in one pass; only the winner is
+            # normalized into an Album
+            best = min(
+                (
+                    result
+                    for result in data.get("results", ())
+                    if result.get("wrapperType") == "collection"
+                    and result.get("collectionType") == "Album"
+                    and result.get("artistName") == "Die drei ???"
+                    and pattern.search(result.get("collectionName", ""))
+                ),
                 key=lambda item: (
                     -(item.get("trackCount") or 0),
                     0 if item.get("collectionPrice") is None else 1,
-                )
+                ),
+                default=None,
             )
+            if best is None:
+                return
 
-            album = self.itunes_client.normalize_album_data(candidates[0])
+            album = self.itunes_client.normalize_album_data(best)
             if album:
                 albums_by_number[number] = album
 
-        await asyncio.gather(*(fetch_episode(n) for n in range(start, end + 1)))
+        # A fixed pool of workers drains the queue instead of one task per episode
+        workers = min(SEARCH_CONCURRENCY, queue.qsize())
+        await asyncio.gather(*(worker() for _ in range(workers)))
         return albums_by_number
 
+    def _store_catalog(self, albums: List[Album]):
+        """Store a freshly built album list and its buckets with one buffered write"""
+        with self.cache_manager.buffered():
+            self.cache_manager.set_albums(albums)
+            self.cache_manager.set_buckets(self._compute_buckets(albums))
+        self._version += 1
+
     async def _precompute_buckets(self, albums: List[Album]):
-        """Precompute age-based buckets: old, medium, new, all"""
+        """Precompute age-based buckets and store them off the event loop"""
+        buckets = self._compute_buckets(albums)
+        await asyncio.to_thread(self.cache_manager.set_buckets, buckets)
+        self._version += 1
+
+    def _compute_buckets(self, albums: List[Album]) -> Dict[str, List[int]]:
+        """Compute age-based buckets: old, medium, new, all"""
+        # Pull the two columns we need once, then sort indices instead of albums
+        ids = [album.collection_id for album in albums]
+        release_keys = [album.release_rank for album in albums]
+        order = sorted(range(len(ids)), key=release_keys.__getitem__)
+        chronological_ids = [ids[i] for i in order]
+
         buckets = {
-            "all": [album.collection_id for album in albums],
+            "all": ids,
         }
 
-        chronological_albums = sorted(albums, key=self._release_sort_key)
-
-        n = len(chronological_albums)
+        n = len(chronological_ids)
         if n > 0:
             third_size = n // 3
             remainder = n % 3
@@ -180,32 +236,36 @@ class CatalogBuilder:
             old_end = third_size + (1 if remainder > 0 else 0)
             medium_end = old_end + third_size + (1 if remainder > 1 else 0)
 
-            old_albums = chronological_albums[:old_end]
-            medium_albums = chronological_albums[old_end:medium_end]
-            new_albums = chronological_albums[medium_end:]
-
-            buckets["old"] = [album.collection_id for album in old_albums]
-            buckets["medium"] = [album.collection_id for album in medium_albums]
-            buckets["new"] = [album.collection_id for album in new_albums]
+            buckets["old"] = chronological_ids[:old_end]
+            buckets["medium"] = chronological_ids[old_end:medium_end]
+            buckets["new"] = chronological_ids[medium_end:]
         else:
             buckets["old"] = []
             buckets["medium"] = []
             buckets["new"] = []
 
-        self.cache_manager.set_buckets(buckets)
+        return buckets
 
-    def _release_sort_key(self, album: Album) -> str:
-        """Sort key that prefers precise release dates, then year, defaults newest last"""
-        if album.release_date:
-            return album.release_date
-        if album.year:
-            return f"{album.year:04d}-12-31T23:59:59Z"
-        return "9999-12-31T23:59:59Z"
+    @property
+    def version(self) -> int:
+        """Counter bumped every time the buckets are rebuilt"""
+        return self._version
 
     def get_buckets(self) -> Dict[str, List[int]]:
         """Get precomputed buckets"""
         return self.cache_manager.get_buckets()
 
+    def get_bucket_albums(self, age: str) -> List[Album]:
+        """Get the albums of a bucket, resolved from collection IDs once per bucket version"""
+        if self._bucket_albums_version != self._version:
+            albums_by_bucket = {}
+            for name, collection_ids in self.get_buckets().items():
+                albums = map(self.cache_manager.get_album_by_id, collection_ids)
+                albums_by_bucket[name] = [album for album in albums if album]
+            self._bucket_albums = albums_by_bucket
+            self._bucket_albums_version = self._version
+        return self._bucket_albums.get(age, [])
+
     def get_refresh_status(self) -> dict[str, int | str | None]:
         """Get catalog refresh status for the UI"""
         return {
@@ -235,12 +295,15 @@ class CatalogBuilder:
         total_runtime = 0
 
         if track_data:
-            for result in track_data.get("results", []):
-                if result.get("wrapperType") == "track":
-                    track_time = result.get("trackTimeMillis", 0)
-                    total_runtime += track_time
+            total_runtime = sum(
+                result.get("trackTimeMillis", 0)
+                for result in track_data.get("results", ())
+                if result.get("wrapperType") == "track"
+            )
 
         if total_runtime > 0:
-            self.cache_manager.set_runtime(collection_id, total_runtime)
+            await asyncio.to_thread(
+                self.cache_manager.set_runtime, collection_id, total_runtime
+            )
 
         return total_runtime if total_runtime > 0 else 0
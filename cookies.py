@@ -2,17 +2,20 @@ from typing import Optional
 from fastapi import Request, Response
 
 
+_VALID_AGES = frozenset(("old", "medium", "new", "all"))
+
+
 def get_age_cookie(request: Request) -> Optional[str]:
     """Get the age selection from the cookie"""
     age = request.cookies.get("age")
-    if age and age in ["old", "medium", "new", "all"]:
+    if age in _VALID_AGES:
         return age
     return None
 
 
 def set_age_cookie(response: Response, age: str):
     """Set the age selection in the cookie (90 days)"""
-    if age not in ["old", "medium", "new", "all"]:
+    if age not in _VALID_AGES:
         age = "all"  # Default to "all" if invalid value
 
     # Set cookie with 90 days expiry, SameSite=Lax
@@ -28,6 +31,10 @@ def set_age_cookie(response: Response, age: str):
 
 def validate_age_param(age: str) -> str:
     """Validate and normalize the age parameter"""
-    if age and age.lower() in ["old", "medium", "new", "all"]:
-        return age.lower()
+    if age in _VALID_AGES:
+        return age
+    if age:
+        age = age.lower()
+        if age in _VALID_AGES:
+            return age
     return "all"  # Default to "all"
@@ -1,11 +1,77 @@
 import asyncio
+import logging
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
 from typing import Optional, Dict, Any
 
 import httpx
+import orjson
 
 from models import Album
 
 
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_SECONDS = 1.0
+THROTTLE_BASE_SECONDS = 5.0
+RETRY_CAP_SECONDS = 30.0
+THROTTLE_STATUSES = frozenset((403, 429, 503))
+
+# Case-insensitive series matchers, so normalization needs no lowercased copies
+_SERIES_COLLECTION_RE = re.compile(r"die drei (?:\?\?\?|fragezeichen)", re.IGNORECASE)
+_SERIES_ARTIST_RE = re.compile(r"die drei \?\?\?", re.IGNORECASE)
+
+
+def _backoff(attempt: int, base: float) -> float:
+    """Full-jitter exponential backoff, so concurrent retries do not fire in lock-step"""
+    return random.uniform(0, min(RETRY_CAP_SECONDS, base * 2**attempt))
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date, capped at RETRY_CAP_SECONDS"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RETRY_CAP_SECONDS)
+
+
+def _year(release_date: str) -> int:
+    """Read the year from a release date ("YYYY-MM-DDTHH:MM:SSZ"), or 0 if it has none"""
+    head = release_date[:4]
+    if len(head) == 4 and head.isascii() and head.isdigit():
+        return (
+            (ord(head[0]) - 48) * 1000
+            + (ord(head[1]) - 48) * 100
+            + (ord(head[2]) - 48) * 10
+            + (ord(head[3]) - 48)
+        )
+    return 0
+
+
+class RateLimiter:
+    """Spaces request starts so at most `rate` begin per second, without capping how many are in flight"""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate
+        self._next_slot = 0.0
+
+    async def wait(self) -> None:
+        """Reserve the next free start slot and sleep until it arrives"""
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
 class iTunesClient:
     """Client for interacting with iTunes/Apple Music API"""
 
@@ -14,15 +80,29 @@ class iTunesClient:
         self.country = "DE"  # German storefront
         self.timeout = timeout
         self.retries = retries
-        self.client = httpx.AsyncClient(timeout=timeout)
+        # One pooled client for the whole catalog build: keep-alive connections
+        # and HTTP/2 multiplexing avoid a TCP+TLS handshake per request. httpx
+        # advertises gzip/deflate, plus br because the brotli extra is installed.
+        self._logged_encoding = False
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(timeout, connect=5.0),
+            http2=True,
+            limits=httpx.Limits(
+                max_keepalive_connections=20,
+                max_connections=20,
+                keepalive_expiry=30,
+            ),
+        )
 
     async def close(self):
         """Close the HTTP client"""
         await self.client.aclose()
 
-    async def search_albums(self, term: str) -> Optional[Dict[str, Any]]:
-        """Search for albums by term"""
-        url = f"{self.base_url}/search"
+    async def search_albums(
+        self, term: str, limiter: Optional[RateLimiter] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Search for albums by term; every attempt waits for a `limiter` slot if given"""
         params = {
             "term": term,
             "entity": "album",
@@ -30,36 +110,14 @@ class iTunesClient:
             "country": self.country,
         }
 
-        for attempt in range(self.retries):
-            try:
-                response = await self.client.get(url, params=params)
-            except httpx.RequestError:
-                if attempt == self.retries - 1:
-                    return None
-                await asyncio.sleep(2**attempt)
-                continue
-
-            if response.status_code == 200:
-                return response.json()
-
-            if response.status_code in {403, 429}:
-                if attempt == self.retries - 1:
-                    return None
-                await asyncio.sleep(5 * (attempt + 1))
-                continue
-
-            if attempt == self.retries - 1:
-                return None
-
-            await asyncio.sleep(2**attempt)
-
-        return None
+        return await self._request_with_retry(
+            "/search", params, self.retries, limiter=limiter
+        )
 
     async def get_tracks_by_album_id(
         self, collection_id: int, limit: int | None = None
     ) -> Optional[Dict[str, Any]]:
         """Get tracks by album ID"""
-        url = f"{self.base_url}/lookup"
         params = {
             "id": collection_id,
             "entity": "song",
@@ -68,67 +126,98 @@ class iTunesClient:
         if limit is not None:
             params["limit"] = limit
 
-        # Shorter timeout for runtime fetch
-        for attempt in range(2):  # Only 2 retries for runtime
+        # Shorter timeout and only 2 attempts for runtime fetch; a timeout
+        # gives up straight away
+        return await self._request_with_retry(
+            "/lookup", params, 2, timeout=3.0, retry_timeouts=False
+        )
+
+    async def _request_with_retry(
+        self,
+        path: str,
+        params: Dict[str, Any],
+        attempts: int,
+        timeout: float | None = None,
+        retry_timeouts: bool = True,
+        limiter: Optional[RateLimiter] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """GET a JSON endpoint, retrying errors with full-jitter backoff and honoring Retry-After"""
+        request_kwargs = {} if timeout is None else {"timeout": timeout}
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            # Retries count against the rate too, not just the first attempt
+            if limiter is not None:
+                await limiter.wait()
             try:
-                response = await self.client.get(url, params=params, timeout=3.0)
+                response = await self.client.get(path, params=params, **request_kwargs)
             except httpx.TimeoutException:
-                return None
+                if last_attempt or not retry_timeouts:
+                    return None
+                await asyncio.sleep(_backoff(attempt, RETRY_BASE_SECONDS))
+                continue
             except httpx.RequestError:
-                if attempt == 1:
+                if last_attempt:
                     return None
-                await asyncio.sleep(1**attempt)
+                await asyncio.sleep(_backoff(attempt, RETRY_BASE_SECONDS))
                 continue
 
             if response.status_code == 200:
-                return response.json()
+                if not self._logged_encoding:
+                    self._logged_encoding = True
+                    logger.info(
+                        "iTunes responses arrive with content-encoding %s",
+                        response.headers.get("content-encoding", "identity"),
+                    )
+                return orjson.loads(response.content)
+
+            if last_attempt:
+                return None
 
-            if response.status_code in {403, 429}:
-                if attempt == 1:
-                    return None
-                await asyncio.sleep(2 * (attempt + 1))
+            if response.status_code in THROTTLE_STATUSES:
+                # iTunes throttles with 403/429; back off harder than for errors
+                delay = _retry_after_seconds(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = _backoff(attempt, THROTTLE_BASE_SECONDS)
+                await asyncio.sleep(delay)
                 continue
 
-            if attempt == 1:
-                return None
-            await asyncio.sleep(1**attempt)
+            await asyncio.sleep(_backoff(attempt, RETRY_BASE_SECONDS))
 
         return None
 
     def normalize_album_data(self, raw_album: Dict[str, Any]) -> Optional[Album]:
         """Normalize raw iTunes album data to Album model"""
         # Only include albums that match the expected pattern
-        collection_name = raw_album.get("collectionName", "")
-        artist_name = raw_album.get("artistName", "")
-        normalized_collection = collection_name.lower()
-        normalized_artist = artist_name.lower()
+        get = raw_album.get
+        collection_name = get("collectionName", "")
         if not (
-            "die drei ???" in normalized_collection
-            or "die drei fragezeichen" in normalized_collection
-            or "die drei ???" in normalized_artist
+            _SERIES_COLLECTION_RE.search(collection_name)
+            or _SERIES_ARTIST_RE.search(get("artistName", ""))
         ):
             return None
 
         # Get artwork URL - start with 100x100 and upgrade to higher resolution
-        artwork_url = raw_album.get("artworkUrl100", "")
+        artwork_url = get("artworkUrl100", "")
         if artwork_url:
-            # Try to upgrade to 1000x1000, fallback to 600x600, then 100x100
-            artwork_url = artwork_url.replace("100x100", "1000x1000")
-
-        release_date = raw_album.get("releaseDate", "")
-        year = 0
-        if release_date:
-            try:
-                # Parse year from release date (format: "YYYY-MM-DDTHH:MM:SSSZ")
-                year = int(release_date[:4])
-            except (ValueError, IndexError):
-                pass
-
-        return Album(
-            collection_id=raw_album.get("collectionId", 0),
+            # Try to upgrade to 1000x1000, fallback to 600x600, then 100x100.
+            # The size is the last path segment (".../100x100bb.jpg"), so
+            # only that one spot is rewritten.
+            size_at = artwork_url.rfind("/100x100")
+            if size_at != -1:
+                artwork_url = (
+                    f"{artwork_url[: size_at + 1]}1000x1000{artwork_url[size_at + 8 :]}"
+                )
+
+        release_date = get("releaseDate", "")
+        year = _year(release_date)
+
+        # Every field is built above with the right type, so skip validation
+        return Album.model_construct(
+            collection_id=get("collectionId", 0),
             collection_name=collection_name,
             artwork_url=artwork_url,
             release_date=release_date,
-            apple_music_url=raw_album.get("collectionViewUrl", ""),
+            apple_music_url=get("collectionViewUrl", ""),
             year=year,
         )
@@ -1,13 +1,25 @@
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
 from pydantic import ValidationError
 import asyncio
+from contextlib import asynccontextmanager
 import json
 import logging
+import mimetypes
+import os
 import random
+import sqlite3
+from collections import deque
+from functools import lru_cache, partial
+from operator import itemgetter
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
+
+import orjson
 
 from models import Album
 from cache import CacheManager
@@ -19,39 +31,95 @@ from cookies import get_age_cookie, set_age_cookie, validate_age_param
 
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI app
-app = FastAPI(title="Die drei ??? Album Viewer")
-
-# Initialize components
-cache_manager = CacheManager()
-itunes_client = iTunesClient()
-catalog_builder = CatalogBuilder(cache_manager, itunes_client)
-analytics_tracker = AnalyticsTracker(cache_manager)
-random_bags: dict[str, list[int]] = {}
-random_bag_sources: dict[str, tuple[int, ...]] = {}
+# Encodings scripts/precompress.py writes next to the built assets, best first
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Queue another shuffled round once a bag runs this low
+BAG_REFILL_THRESHOLD = 8
+
+
+class OrjsonResponse(JSONResponse):
+    """JSON response rendered with orjson; allows the int-keyed analytics maps"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=4096)
+def format_runtime(runtime_millis: int) -> str:
+    """Format a runtime in milliseconds as m:ss; albums share few distinct runtimes"""
+    minutes, remainder = divmod(runtime_millis, 60000)
+    return f"{minutes}:{remainder // 1000:02d}"
+
+
+# Sent unchanged on every miss, so it is encoded once
+NO_ALBUMS_RESPONSE = Response(
+    content=b'{"error":"no_albums"}',
+    media_type="application/json",
+    status_code=status.HTTP_404_NOT_FOUND,
+    headers={"Cache-Control": "no-store"},
+)
+
+
+# Components are created in lifespan() so the HTTP connection pool belongs to
+# the serving event loop, and the cache database and analytics flusher are
+# opened and closed with the app
+random_bags: dict[str, deque[Album]] = {}
+random_bag_versions: dict[str, int] = {}
+random_bag_refills: dict[str, asyncio.Task] = {}
 refresh_task: asyncio.Task | None = None
 startup_task: asyncio.Task | None = None
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize the catalog on startup"""
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the cache, iTunes client and analytics tracker, start the catalog build, and clean up on shutdown"""
     global startup_task
+    cache_manager = CacheManager()
+    itunes_client = iTunesClient()
+    catalog_builder = CatalogBuilder(cache_manager, itunes_client)
+    analytics_tracker = AnalyticsTracker(cache_manager)
+    app.state.cache_manager = cache_manager
+    app.state.itunes_client = itunes_client
+    app.state.analytics_tracker = analytics_tracker
+    app.state.catalog_builder = catalog_builder
 
     async def _build_on_startup() -> None:
         try:
             await catalog_builder.build_catalog(force_refresh=False)
-        except (json.JSONDecodeError, OSError, ValidationError):
+            prime_random_bags(catalog_builder)
+        except (json.JSONDecodeError, OSError, ValidationError, sqlite3.Error):
             logger.exception("Catalog build failed on startup")
 
     startup_task = asyncio.create_task(_build_on_startup())
+    try:
+        yield
+    finally:
+        # Stop everything that may still use the cache before closing it
+        tasks = [
+            task
+            for task in (startup_task, refresh_task, *random_bag_refills.values())
+            if task and not task.done()
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await catalog_builder.cancel_build()
+        random_bags.clear()
+        random_bag_versions.clear()
+        random_bag_refills.clear()
+
+        analytics_tracker.close()
+        await itunes_client.close()
+        cache_manager.close()
 
 
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Save analytics on shutdown"""
-    analytics_tracker.save_analytics()
-    await itunes_client.close()
+# Initialize FastAPI app
+app = FastAPI(
+    title="Die drei ??? Album Viewer",
+    default_response_class=OrjsonResponse,
+    lifespan=lifespan,
+)
 
 
 @app.get("/api/healthz")
@@ -61,53 +129,33 @@ async def health_check():
 
 
 @app.get("/api/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """Return analytics stats (for admin/development purposes)"""
-    return analytics_tracker.get_analytics()
+    return request.app.state.analytics_tracker.get_analytics()
 
 
 @app.get("/api/admin/catalog/status")
-async def admin_catalog_status():
+async def admin_catalog_status(request: Request):
     """Get catalog refresh status for the SPA"""
-    response = JSONResponse(catalog_builder.get_refresh_status())
+    catalog_builder: CatalogBuilder = request.app.state.catalog_builder
+    response = OrjsonResponse(catalog_builder.get_refresh_status())
     response.headers["Cache-Control"] = "no-store"
     return response
 
 
 @app.post("/api/admin/catalog/refresh")
-async def admin_catalog_refresh():
+async def admin_catalog_refresh(request: Request):
     """Force-refresh the catalog and report the current count"""
-    global refresh_task
     if refresh_task and not refresh_task.done():
-        response = JSONResponse(
+        response = OrjsonResponse(
             {"state": "running", "started": False},
             status_code=status.HTTP_202_ACCEPTED,
         )
         response.headers["Cache-Control"] = "no-store"
         return response
 
-    refresh_task = asyncio.create_task(
-        catalog_builder.build_catalog(force_refresh=True)
-    )
-
-    def _on_refresh_done(task: asyncio.Task) -> None:
-        global refresh_task
-        if task.cancelled():
-            if refresh_task is task:
-                refresh_task = None
-            return
-        exc = task.exception()
-        if exc:
-            catalog_builder.mark_refresh_error("exception")
-            logger.error(
-                "Catalog refresh failed",
-                exc_info=(type(exc), exc, exc.__traceback__),
-            )
-        if refresh_task is task:
-            refresh_task = None
-
-    refresh_task.add_done_callback(_on_refresh_done)
-    response = JSONResponse(
+    start_catalog_refresh(request.app.state.catalog_builder)
+    response = OrjsonResponse(
         {"state": "running", "started": True},
         status_code=status.HTTP_202_ACCEPTED,
     )
@@ -123,31 +171,26 @@ async def api_random_album(
     preferred_age = get_age_cookie(request)
     selected_age = validate_age_param(age) if age else (preferred_age or "all")
 
-    album = await get_random_album_from_bucket(selected_age)
+    album = await get_random_album_from_bucket(
+        request.app.state.catalog_builder, selected_age
+    )
     if not album:
-        response = JSONResponse(
-            {"error": "no_albums"}, status_code=status.HTTP_404_NOT_FOUND
-        )
-        response.headers["Cache-Control"] = "no-store"
-        return response
+        return NO_ALBUMS_RESPONSE
 
-    runtime_str = None
-    if album.runtime_millis:
-        minutes = album.runtime_millis // 60000
-        seconds = (album.runtime_millis % 60000) // 1000
-        runtime_str = f"{minutes}:{seconds:02d}"
+    runtime_str = format_runtime(album.runtime_millis) if album.runtime_millis else None
 
     payload = {
         "age": selected_age,
-        "album": album.model_dump(),
+        "album": album.json_fragment,
         "runtime_millis": album.runtime_millis,
         "runtime_str": runtime_str,
     }
 
-    response = JSONResponse(payload)
+    response = OrjsonResponse(payload)
     set_age_cookie(response, selected_age)
     response.headers["Cache-Control"] = "no-store"
 
+    analytics_tracker: AnalyticsTracker = request.app.state.analytics_tracker
     if reroll:
         analytics_tracker.increment_and_save_sometimes(
             selected_age, album.collection_id
@@ -157,43 +200,163 @@ async def api_random_album(
     return response
 
 
-async def get_random_album_from_bucket(age: str) -> Optional[Album]:
+async def get_random_album_from_bucket(
+    catalog_builder: CatalogBuilder, age: str
+) -> Optional[Album]:
     """Get a random album from the specified age bucket"""
-    albums = cache_manager.get_albums()
-    if not albums or len(albums) < 4:
-        await catalog_builder.build_catalog(force_refresh=True)
-
-    buckets = catalog_builder.get_buckets()
-    if not buckets or not buckets.get(age):
-        await catalog_builder.build_catalog(force_refresh=True)
-        buckets = catalog_builder.get_buckets()
-
-    collection_ids = buckets.get(age, [])
+    # Wait for the build started at startup instead of racing it with another
+    if startup_task and not startup_task.done():
+        await asyncio.shield(startup_task)
 
-    if not collection_ids:
-        return None
+    albums = catalog_builder.cache_manager.get_albums()
+    if len(albums) < 4 or not catalog_builder.get_buckets().get(age):
+        # Concurrent requests all wait on the same refresh
+        await asyncio.shield(start_catalog_refresh(catalog_builder))
 
-    bag_source = tuple(collection_ids)
     bag = random_bags.get(age)
-    if bag_source != random_bag_sources.get(age) or not bag:
-        bag = list(bag_source)
-        random.shuffle(bag)
+    if catalog_builder.version != random_bag_versions.get(age) or not bag:
+        # Only hit when no prepared bag exists yet; normally refills stay ahead
+        bucket_albums = catalog_builder.get_bucket_albums(age)
+        if not bucket_albums:
+            return None
+        bag = deque(random.sample(bucket_albums, len(bucket_albums)))
         random_bags[age] = bag
-        random_bag_sources[age] = bag_source
+        random_bag_versions[age] = catalog_builder.version
 
-    collection_id = random_bags[age].pop()
-    album = catalog_builder.get_album_by_id(collection_id)
+    # Bags hold the albums themselves, so no ID lookup happens per request
+    album = bag.popleft()
+    if len(bag) <= BAG_REFILL_THRESHOLD:
+        schedule_bag_refill(catalog_builder, age)
+    return album
 
-    if not album:
-        return None
 
-    return album
+def start_catalog_refresh(catalog_builder: CatalogBuilder) -> asyncio.Task:
+    """Start a forced catalog refresh, or return the one already running"""
+    global refresh_task
+    if refresh_task and not refresh_task.done():
+        return refresh_task
+
+    refresh_task = asyncio.create_task(
+        catalog_builder.build_catalog(force_refresh=True)
+    )
+    refresh_task.add_done_callback(partial(_on_refresh_done, catalog_builder))
+    return refresh_task
+
+
+def _on_refresh_done(catalog_builder: CatalogBuilder, task: asyncio.Task) -> None:
+    global refresh_task
+    if task.cancelled():
+        if refresh_task is task:
+            refresh_task = None
+        return
+    exc = task.exception()
+    if exc:
+        catalog_builder.mark_refresh_error("exception")
+        logger.error(
+            "Catalog refresh failed",
+            exc_info=(type(exc), exc, exc.__traceback__),
+        )
+    else:
+        prime_random_bags(catalog_builder)
+    if refresh_task is task:
+        refresh_task = None
+
+
+def prime_random_bags(catalog_builder: CatalogBuilder) -> None:
+    """Shuffle a bag for every bucket right after a catalog build"""
+    version = catalog_builder.version
+    for age in catalog_builder.get_buckets():
+        bucket_albums = catalog_builder.get_bucket_albums(age)
+        random_bags[age] = deque(random.sample(bucket_albums, len(bucket_albums)))
+        random_bag_versions[age] = version
+
+
+def schedule_bag_refill(catalog_builder: CatalogBuilder, age: str) -> None:
+    """Top up a bag in the background unless a refill is already pending"""
+    task = random_bag_refills.get(age)
+    if task and not task.done():
+        return
+    random_bag_refills[age] = asyncio.create_task(_refill_bag(catalog_builder, age))
+
+
+async def _refill_bag(catalog_builder: CatalogBuilder, age: str) -> None:
+    """Append another shuffled round so requests never shuffle inline"""
+    bag = random_bags.get(age)
+    if bag is None or random_bag_versions.get(age) != catalog_builder.version:
+        return
+    bucket_albums = catalog_builder.get_bucket_albums(age)
+    bag.extend(random.sample(bucket_albums, len(bucket_albums)))
+
+
+def _encoding_qualities(accept_encoding: str) -> dict[str, float]:
+    """Parse an Accept-Encoding header into coding -> q-value"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """Static files that send a prebuilt .br/.gz sibling when the client accepts it"""
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        qualities = _encoding_qualities(request_headers.get("accept-encoding", ""))
+        variants = []
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            compressed_path = f"{full_path}{suffix}"
+            try:
+                variants.append((encoding, compressed_path, os.stat(compressed_path)))
+            except OSError:
+                continue
+
+        # A coding that is missing falls back to "*"; q=0 refuses it. The
+        # highest q wins, ties go to the order of PRECOMPRESSED_ENCODINGS.
+        acceptable = [
+            (qualities.get(variant[0], qualities.get("*", 0.0)), variant)
+            for variant in variants
+        ]
+        acceptable = [item for item in acceptable if item[0] > 0]
+        if acceptable:
+            _, (encoding, compressed_path, compressed_stat) = max(
+                acceptable, key=itemgetter(0)
+            )
+            response = FileResponse(
+                compressed_path,
+                status_code=status_code,
+                stat_result=compressed_stat,
+                media_type=mimetypes.guess_type(full_path)[0] or "text/plain",
+                headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+            )
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if variants:
+            # Caches must not hand this identity copy to clients that accept br/gzip
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
 
 
 def mount_spa() -> None:
     dist_path = Path(__file__).resolve().parent / "frontend" / "dist"
     if dist_path.exists():
-        app.mount("/", StaticFiles(directory=dist_path, html=True), name="spa")
+        app.mount(
+            "/", PrecompressedStaticFiles(directory=dist_path, html=True), name="spa"
+        )
 
 
 mount_spa()
@@ -1,10 +1,21 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from functools import cached_property
+import re
+
+import orjson
+from pydantic import BaseModel, ConfigDict
+from typing import Dict, Optional, List
+
+
+_NUM_RE = re.compile(r"\d+")
+_DATE_SEPARATORS = str.maketrans("", "", "-T:")
+_UNKNOWN_RELEASE_RANK = 99991231235959
 
 
 class Album(BaseModel):
     """Model for a Die drei ??? album"""
 
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     collection_id: int
     collection_name: str
     artwork_url: str
@@ -13,6 +24,30 @@ class Album(BaseModel):
     year: int
     runtime_millis: Optional[int] = None  # Total runtime in milliseconds
 
+    @cached_property
+    def sort_key(self) -> tuple:
+        """Numeric-aware name key so 'Folge 2' sorts before 'Folge 10', computed once per album"""
+        text = self.collection_name.lower()
+        match = _NUM_RE.search(text)
+        if match:
+            return (text[: match.start()], int(match.group()), text[match.end() :])
+        return (text, 0, "")
+
+    @cached_property
+    def release_rank(self) -> int:
+        """Chronological sort rank as YYYYMMDDhhmmss; falls back to the year's end, unknown dates last"""
+        digits = self.release_date[:19].translate(_DATE_SEPARATORS)
+        if digits.isdigit() and len(digits) in (8, 14):
+            return int(digits.ljust(14, "0"))
+        if self.year:
+            return self.year * 10**10 + 1231235959
+        return _UNKNOWN_RELEASE_RANK
+
+    @cached_property
+    def json_fragment(self) -> orjson.Fragment:
+        """The album serialized once, for embedding in API responses without re-dumping"""
+        return orjson.Fragment(orjson.dumps(self.model_dump()))
+
 
 class CatalogResponse(BaseModel):
     """Response model for the full album catalog"""
@@ -32,5 +67,6 @@ class CacheData(BaseModel):
     """Model for cached data structure"""
 
     albums: List[Album] = []
-    buckets: dict = {}  # Maps 'old', 'medium', 'new', 'all' to lists of collection_ids
-    lengths: dict = {}  # Maps collection_id to total runtime in millis
+    # Maps 'old', 'medium', 'new', 'all' to lists of collection_ids
+    buckets: Dict[str, List[int]] = {}
+    lengths: Dict[int, int] = {}  # Maps collection_id to total runtime in millis
@@ -1,39 +1,67 @@
+import asyncio
+import json
 import os
+import shlex
 import signal
-import socket
-import subprocess
 import sys
-import threading
-import time
+from collections import deque
 
 
 BACKEND_PORT = 8000
+READ_BLOCK_SIZE = 1 << 16
+SHELL_OPERATORS = frozenset(("&&", "||", ";", "|", ">", "<"))
+RECENT_LINES = 50
+SHUTDOWN_TIMEOUT_SECONDS = 5
 
 COLOR_RESET = "\033[0m"
 COLOR_BACKEND = "\033[34m"
 COLOR_FRONTEND = "\033[35m"
 
 
-def ensure_port_available(port: int) -> None:
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        try:
-            sock.bind(("127.0.0.1", port))
-        except OSError:
-            print(f"Port {port} is not available. Stop the process using it and retry.")
-            raise SystemExit(1)
-
-
-def stream_output(prefix: str, color: str, stream) -> None:
-    for line in iter(stream.readline, ""):
-        if not line:
-            break
-        print(f"{color}[{prefix}]{COLOR_RESET} {line.rstrip()}", flush=True)
-
-
-def main() -> None:
-    ensure_port_available(BACKEND_PORT)
-
+def resolve_frontend_command(frontend_dir: str) -> list[str]:
+    # Run the dev script's binary directly rather than through npm, so there
+    # is one process less and signals reach Vite itself
+    fallback = ["npm", "run", "dev"]
+    try:
+        with open(os.path.join(frontend_dir, "package.json")) as f:
+            dev_cmd = shlex.split(json.load(f)["scripts"]["dev"])
+    except (OSError, KeyError, ValueError):
+        return fallback
+
+    # Scripts that need a shell (chained or piped commands) stay with npm
+    if not dev_cmd or SHELL_OPERATORS.intersection(dev_cmd):
+        return fallback
+    binary = os.path.join(frontend_dir, "node_modules", ".bin", dev_cmd[0])
+    if not os.access(binary, os.X_OK):
+        return fallback
+    return [binary, *dev_cmd[1:]]
+
+
+async def pump(
+    prefix: str,
+    color: str,
+    reader: asyncio.StreamReader,
+    recent: deque[bytes] | None = None,
+) -> None:
+    label = f"{color}[{prefix}]{COLOR_RESET} ".encode()
+    out = sys.stdout.buffer
+    # Read whatever is buffered in large blocks and split lines here, so a
+    # burst of log output is forwarded with one read and one write. Output
+    # stays bytes end to end; nothing is decoded just to be re-encoded.
+    tail = b""
+    while chunk := await reader.read(READ_BLOCK_SIZE):
+        *lines, tail = (tail + chunk).split(b"\n")
+        if recent is not None:
+            recent.extend(lines)
+        if lines:
+            out.write(b"".join(label + line.rstrip() + b"\n" for line in lines))
+            out.flush()
+    if tail:
+        out.write(label + tail.rstrip() + b"\n")
+        out.flush()
+
+
+async def main() -> None:
     backend_cmd = [
         sys.executable,
         "-m",
@@ -44,76 +72,86 @@ def main() -> None:
         str(BACKEND_PORT),
     ]
 
-    frontend_cmd = ["npm", "run", "dev"]
+    frontend_dir = os.path.join(os.getcwd(), "frontend")
+    frontend_cmd = resolve_frontend_command(frontend_dir)
 
-    backend = subprocess.Popen(
-        backend_cmd,
+    backend = await asyncio.create_subprocess_exec(
+        *backend_cmd,
         cwd=os.getcwd(),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
         start_new_session=True,
     )
-    frontend = subprocess.Popen(
-        frontend_cmd,
-        cwd=os.path.join(os.getcwd(), "frontend"),
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
+    frontend = await asyncio.create_subprocess_exec(
+        *frontend_cmd,
+        cwd=frontend_dir,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
         start_new_session=True,
     )
 
-    threads = [
-        threading.Thread(
-            target=stream_output,
-            args=("backend", COLOR_BACKEND, backend.stdout),
-            daemon=True,
-        ),
-        threading.Thread(
-            target=stream_output,
-            args=("frontend", COLOR_FRONTEND, frontend.stdout),
-            daemon=True,
+    # Log pumps and exit watchers all run on this one event loop. On Linux,
+    # asyncio's child watcher registers a pidfd per child with the loop, so
+    # wait() wakes the moment a child exits instead of polling for it.
+    backend_recent: deque[bytes] = deque(maxlen=RECENT_LINES)
+    pumps = [
+        asyncio.create_task(
+            pump("backend", COLOR_BACKEND, backend.stdout, backend_recent)
         ),
+        asyncio.create_task(pump("frontend", COLOR_FRONTEND, frontend.stdout)),
     ]
-
-    for thread in threads:
-        thread.start()
+    exits = {
+        asyncio.create_task(backend.wait()): ("backend", COLOR_BACKEND),
+        asyncio.create_task(frontend.wait()): ("frontend", COLOR_FRONTEND),
+    }
 
     try:
-        while True:
-            backend_code = backend.poll()
-            frontend_code = frontend.poll()
-            if backend_code is not None or frontend_code is not None:
-                if backend_code is not None:
-                    print(
-                        f"{COLOR_BACKEND}[backend]{COLOR_RESET} exited with code {backend_code}",
-                        flush=True,
-                    )
-                if frontend_code is not None:
-                    print(
-                        f"{COLOR_FRONTEND}[frontend]{COLOR_RESET} exited with code {frontend_code}",
-                        flush=True,
-                    )
-                break
-            time.sleep(0.2)
-    except KeyboardInterrupt:
+        done, _ = await asyncio.wait(exits, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            prefix, color = exits[task]
+            print(
+                f"{color}[{prefix}]{COLOR_RESET} exited with code {task.result()}",
+                flush=True,
+            )
+
+        # Uvicorn binds the port itself, so a taken port shows up as an early
+        # exit; let its last lines drain, then check for the bind error
+        if backend.returncode:
+            await asyncio.wait(pumps[:1], timeout=1)
+            if any(
+                b"address already in use" in line.lower() for line in backend_recent
+            ):
+                print(
+                    f"Port {BACKEND_PORT} is not available. "
+                    "Stop the process using it and retry."
+                )
+    except asyncio.CancelledError:
         print("Shutting down dev servers...")
+        raise
     finally:
         for proc in (backend, frontend):
-            if proc.poll() is None:
+            if proc.returncode is None:
                 try:
                     os.killpg(proc.pid, signal.SIGTERM)
                 except ProcessLookupError:
                     pass
-        for proc in (backend, frontend):
+        # Wait for both children against one shared deadline instead of
+        # giving each its own 5 s in turn
+        reaps = {asyncio.create_task(proc.wait()): proc for proc in (backend, frontend)}
+        _, pending = await asyncio.wait(reaps, timeout=SHUTDOWN_TIMEOUT_SECONDS)
+        for task in pending:
             try:
-                proc.wait(timeout=5)
-            except subprocess.TimeoutExpired:
-                try:
-                    os.killpg(proc.pid, signal.SIGKILL)
-                except ProcessLookupError:
-                    pass
+                os.killpg(reaps[task].pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        if pending:
+            await asyncio.wait(pending)
+        for task in (*pumps, *exits):
+            task.cancel()
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
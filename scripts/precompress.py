@@ -0,0 +1,40 @@
+import gzip
+import sys
+from pathlib import Path
+
+import brotli
+
+
+DIST_DIR = Path(__file__).resolve().parent.parent / "frontend" / "dist"
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".svg", ".json", ".txt"}
+MIN_SIZE = 1024
+
+
+def precompress(path: Path) -> None:
+    data = path.read_bytes()
+    path.with_name(path.name + ".br").write_bytes(brotli.compress(data, quality=11))
+    path.with_name(path.name + ".gz").write_bytes(
+        gzip.compress(data, compresslevel=9, mtime=0)
+    )
+
+
+def main() -> None:
+    dist_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else DIST_DIR
+    if not dist_dir.is_dir():
+        print(f"{dist_dir} does not exist. Build the frontend first.")
+        raise SystemExit(1)
+
+    count = 0
+    for path in dist_dir.rglob("*"):
+        if (
+            path.is_file()
+            and path.suffix in COMPRESSIBLE_SUFFIXES
+            and path.stat().st_size >= MIN_SIZE
+        ):
+            precompress(path)
+            count += 1
+    print(f"Precompressed {count} files in {dist_dir}")
+
+
+if __name__ == "__main__":
+    main()
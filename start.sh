@@ -2,4 +2,4 @@
 PROJECT_DIR="~/Documents/ddf"
 cd "$PROJECT_DIR"
 source .venv/bin/activate
-uvicorn main:app --port 8005 --host 0.0.0.0
+uvicorn main:app --port 8005 --host 0.0.0.0 --loop uvloop --http httptools